@@ -0,0 +1,86 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional
+
+
+class DynamicBatcher:
+    """Coalesce concurrent requests into a single batched model call.
+
+    Items submitted close together are collected for up to `max_wait_ms`
+    or until `max_batch_size` is reached, then passed to `batch_fn` on the
+    batcher's own worker thread. `batch_fn` must return one result per
+    item, in order.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 10,
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+        self.executor: Optional[ThreadPoolExecutor] = None
+
+    def start(self):
+        # One long-lived thread per run, so per-thread state such as
+        # torch.compile's CUDA graph trees is recorded once rather than in
+        # every pool thread. Created here so a restarted lifespan gets a
+        # fresh executor after stop() shut the previous one down.
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.queue = asyncio.Queue()
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.executor.shutdown(wait=False)
+
+    async def submit(self, item: Any) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((item, future))
+        return await future
+
+    async def _collect(self) -> List[Any]:
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            # Skip callers that already went away (e.g. client disconnects)
+            batch = [(item, future) for item, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            try:
+                results = await asyncio.get_running_loop().run_in_executor(
+                    self.executor, self.batch_fn, [item for item, _ in batch]
+                )
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
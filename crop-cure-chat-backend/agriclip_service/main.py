@@ -1,13 +1,13 @@
 import io
 import os
 import time
+from contextlib import asynccontextmanager
 from typing import List, Optional, Dict, Any
 
 from fastapi import FastAPI, File, UploadFile, Form, Body
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from PIL import Image
-import numpy as np
 
 # YOLOv8 for detection
 import torch
@@ -18,8 +18,23 @@ from torchvision.models.detection import fasterrcnn_resnet50_fpn, FasterRCNN_Res
 
 # Import the new text query service
 from text_query_service import router as text_query_router
+from text_query_service import lifespan as text_query_lifespan
 
-app = FastAPI(title="AgriCLIP Model Service", version="1.0.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load every model before the first request instead of on demand
+    load_models()
+    async with text_query_lifespan(app):
+        yield
+
+
+app = FastAPI(
+    title="AgriCLIP Model Service",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -33,7 +48,7 @@ app.add_middleware(
 app.include_router(text_query_router)
 
 
-# Lazy-loaded models
+# Models, loaded once in the app lifespan
 _detector: Optional[torch.nn.Module] = None
 _effnet: Optional[torch.nn.Module] = None
 _effnet_transform = None
@@ -76,13 +91,12 @@ def pil_image_from_upload(upload: UploadFile) -> Image.Image:
 
 
 def detect_objects(image: Image.Image) -> List[Dict[str, Any]]:
-    load_models()
     # Convert PIL to tensor
     transform = transforms.Compose([
         transforms.ToTensor(),
     ])
     tensor = transform(image)
-    with torch.no_grad():
+    with torch.inference_mode():
         outputs = _detector([tensor])[0]
     detections: List[Dict[str, Any]] = []
     boxes = outputs.get("boxes")
@@ -103,10 +117,9 @@ def detect_objects(image: Image.Image) -> List[Dict[str, Any]]:
 
 
 def classify_crop(image: Image.Image) -> Dict[str, Any]:
-    load_models()
     # Transform and forward pass
     tensor = _effnet_transform(image).unsqueeze(0)
-    with torch.no_grad():
+    with torch.inference_mode():
         logits = _effnet(tensor)
         probs = F.softmax(logits, dim=1)
         conf, idx = probs.max(dim=1)
@@ -163,7 +176,6 @@ def make_narrative(domain: str, cls_label: str, cls_conf: float, detections: Lis
 
 @app.get("/health")
 def health():
-    load_models()
     return {"success": True, "message": "AgriCLIP service running", "models": {
         "detector": "fasterrcnn_resnet50_fpn_coco",
         "classifier": "efficientnet_b3_imagenet",
@@ -281,7 +293,7 @@ def classify(
 
         processing_time = int(round((time.time() - start) * 1000))
 
-        return JSONResponse({
+        return ORJSONResponse({
             "success": True,
             "message": "Classification completed",
             "data": {
@@ -301,7 +313,7 @@ def classify(
             }
         })
     except Exception as e:
-        return JSONResponse(status_code=500, content={
+        return ORJSONResponse(status_code=500, content={
             "success": False,
             "message": "Error during classification",
             "detail": str(e)
@@ -0,0 +1,205 @@
+import copy
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import torch
+from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+from transformers.cache_utils import EncoderDecoderCache, StaticCache
+
+# --------------------------------------------------
+# Shared T5 models
+# --------------------------------------------------
+# Every router asks this module for its tokenizer and text model, so one
+# checkpoint is only ever loaded once per process.
+DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+
+CAPTURE_WARMUP_STEPS = 3
+
+
+def inference_dtype(allow_fp16: bool = True) -> torch.dtype:
+    """Half precision on GPU, preferring bf16 where the hardware has it.
+
+    Pre-Ampere GPUs only emulate bf16, which is slower than fp32, so they
+    get fp16 instead. Callers whose model overflows in fp16 (T5) pass
+    allow_fp16=False and stay in fp32 on those GPUs.
+    """
+    if DEVICE != "cuda":
+        return torch.float32
+    if torch.cuda.is_bf16_supported(including_emulation=False):
+        return torch.bfloat16
+    return torch.float16 if allow_fp16 else torch.float32
+
+
+@lru_cache(maxsize=None)
+def get_tokenizer(name: str):
+    # The Rust-backed tokenizer detokenizes far faster than the Python one
+    return AutoTokenizer.from_pretrained(name, use_fast=True)
+
+
+@lru_cache(maxsize=None)
+def get_text_model(name: str):
+    # torch_dtype (unlike .half()) keeps T5's fp32-sensitive layers in fp32
+    model = AutoModelForSeq2SeqLM.from_pretrained(
+        name, torch_dtype=inference_dtype(allow_fp16=False)
+    ).to(DEVICE)
+    model.eval()
+    model.config.use_cache = True
+    return model
+
+
+def to_device(tensor: torch.Tensor, device: str = DEVICE) -> torch.Tensor:
+    """Move a CPU tensor to `device` through pinned memory.
+
+    Pinned blocks come from PyTorch's caching host allocator, so they are
+    reused across requests and never recycled before their copy finishes.
+    """
+    if device != "cuda":
+        return tensor
+    return tensor.pin_memory().to(device, non_blocking=True)
+
+
+def tokenize_to_bucket(
+    tokenizer, texts: List[str], buckets: Sequence[int], device: str = DEVICE
+) -> Dict[str, torch.Tensor]:
+    """Tokenize and right-pad to the smallest length bucket that fits."""
+    encoded = tokenizer(texts, truncation=True, max_length=buckets[-1])
+    return pad_to_bucket(tokenizer, encoded["input_ids"], buckets, device)
+
+
+def pad_to_bucket(
+    tokenizer, input_ids: List[List[int]], buckets: Sequence[int], device: str = DEVICE
+) -> Dict[str, torch.Tensor]:
+    """Right-pad token ids to the smallest length bucket that fits."""
+    length = max(len(ids) for ids in input_ids)
+    bucket = next(b for b in buckets if b >= length)
+    padded = tokenizer.pad(
+        {"input_ids": input_ids}, padding="max_length", max_length=bucket, return_tensors="pt"
+    )
+    return {key: to_device(value, device) for key, value in padded.items()}
+
+
+# --------------------------------------------------
+# CUDA Graph Decoding
+# --------------------------------------------------
+class T5DecodeGraph:
+    """Greedy T5 decode step captured once and replayed for every new token.
+
+    Everything the step touches lives in static buffers, so a request only
+    copies its encoder output in, runs one eager step to fill the
+    cross-attention cache, and then replays the graph token by token.
+    """
+
+    def __init__(self, model, encoder_length: int, max_new_tokens: int):
+        self.model = model
+        self.max_new_tokens = max_new_tokens
+        self.graph = None
+        self.lock = threading.Lock()
+
+        dtype = next(model.parameters()).dtype
+        config = copy.deepcopy(model.config)
+        config.num_layers = config.num_decoder_layers
+        config.head_dim = config.d_kv
+
+        self.cache = EncoderDecoderCache(
+            StaticCache(config, batch_size=1, max_cache_len=max_new_tokens, device=DEVICE, dtype=dtype),
+            StaticCache(config, batch_size=1, max_cache_len=encoder_length, device=DEVICE, dtype=dtype),
+        )
+        self.encoder_hidden_states = torch.zeros(
+            1, encoder_length, config.d_model, device=DEVICE, dtype=dtype
+        )
+        self.encoder_attention_mask = torch.ones(1, encoder_length, dtype=torch.long, device=DEVICE)
+        self.decoder_attention_mask = torch.ones(1, max_new_tokens, dtype=torch.long, device=DEVICE)
+        self.input_ids = torch.zeros(1, 1, dtype=torch.long, device=DEVICE)
+        self.cache_position = torch.zeros(1, dtype=torch.long, device=DEVICE)
+        self.next_token = torch.zeros(1, dtype=torch.long, device=DEVICE)
+
+    def _step(self):
+        outputs = self.model(
+            encoder_outputs=(self.encoder_hidden_states,),
+            attention_mask=self.encoder_attention_mask,
+            decoder_input_ids=self.input_ids,
+            decoder_attention_mask=self.decoder_attention_mask,
+            past_key_values=self.cache,
+            cache_position=self.cache_position,
+            use_cache=True,
+        )
+        self.next_token.copy_(outputs.logits[:, -1].argmax(dim=-1))
+        self.input_ids.copy_(self.next_token.view(1, 1))
+        self.cache_position.add_(1)
+
+    def _prefill(self, encoder_hidden_states: torch.Tensor, attention_mask: torch.Tensor):
+        self.encoder_hidden_states.copy_(encoder_hidden_states)
+        self.encoder_attention_mask.copy_(attention_mask)
+        # Force the eager step to recompute cross-attention keys/values
+        for layer_idx in self.cache.is_updated:
+            self.cache.is_updated[layer_idx] = False
+        self.input_ids.fill_(self.model.config.decoder_start_token_id)
+        self.cache_position.zero_()
+        self._step()
+
+    def capture(self, encoder_hidden_states: torch.Tensor, attention_mask: torch.Tensor):
+        self._prefill(encoder_hidden_states, attention_mask)
+
+        stream = torch.cuda.Stream()
+        stream.wait_stream(torch.cuda.current_stream())
+        with torch.cuda.stream(stream):
+            for _ in range(CAPTURE_WARMUP_STEPS):
+                self._step()
+        torch.cuda.current_stream().wait_stream(stream)
+
+        self.graph = torch.cuda.CUDAGraph()
+        with torch.cuda.graph(self.graph):
+            self._step()
+
+    def generate(self, encoder_hidden_states: torch.Tensor, attention_mask: torch.Tensor) -> List[int]:
+        eos_token_id = self.model.config.eos_token_id
+
+        with self.lock:
+            self._prefill(encoder_hidden_states, attention_mask)
+            tokens = [self.next_token.item()]
+            while tokens[-1] != eos_token_id and len(tokens) < self.max_new_tokens:
+                self.graph.replay()
+                tokens.append(self.next_token.item())
+
+        return tokens
+
+
+# Decode graphs keyed by (model, encoder length, token budget), captured
+# lazily. None marks a shape whose capture failed.
+captured_graphs: Dict[Tuple[str, int, int], Optional[T5DecodeGraph]] = {}
+capture_lock = threading.Lock()
+
+
+def get_decode_graph(
+    name: str, inputs: Dict[str, torch.Tensor], max_new_tokens: int
+) -> Optional[T5DecodeGraph]:
+    if DEVICE != "cuda":
+        return None
+
+    key = (name, inputs["input_ids"].shape[1], max_new_tokens)
+    if key not in captured_graphs:
+        with capture_lock:
+            if key not in captured_graphs:
+                captured_graphs[key] = capture_decode_graph(name, inputs, max_new_tokens)
+
+    return captured_graphs[key]
+
+
+def capture_decode_graph(
+    name: str, inputs: Dict[str, torch.Tensor], max_new_tokens: int
+) -> Optional[T5DecodeGraph]:
+    model = get_text_model(name)
+    encoder_length = inputs["input_ids"].shape[1]
+    runner = T5DecodeGraph(model, encoder_length, max_new_tokens)
+
+    try:
+        with torch.inference_mode():
+            encoder_hidden_states = model.get_encoder()(**inputs).last_hidden_state
+            runner.capture(encoder_hidden_states, inputs["attention_mask"])
+    except Exception as e:
+        # Remember the failure so this shape stays on the eager path
+        print(f"CUDA graph capture failed for {name} at length {encoder_length}: {e}")
+        return None
+
+    return runner
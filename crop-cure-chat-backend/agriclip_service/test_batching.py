@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+from batching import DynamicBatcher
+
+
+class RecordingBatchFn:
+    """Batch function that doubles each item and records the batches it saw."""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, items):
+        self.batches.append(list(items))
+        return [item * 2 for item in items]
+
+
+async def submit_all(batcher, items):
+    return await asyncio.gather(*(batcher.submit(item) for item in items))
+
+
+def test_concurrent_items_share_one_batch_in_order():
+    batch_fn = RecordingBatchFn()
+
+    async def run():
+        batcher = DynamicBatcher(batch_fn, max_batch_size=8, max_wait_ms=50)
+        batcher.start()
+        try:
+            return await submit_all(batcher, [1, 2, 3])
+        finally:
+            await batcher.stop()
+
+    assert asyncio.run(run()) == [2, 4, 6]
+    assert batch_fn.batches == [[1, 2, 3]]
+
+
+def test_batches_are_capped_at_max_batch_size():
+    batch_fn = RecordingBatchFn()
+
+    async def run():
+        batcher = DynamicBatcher(batch_fn, max_batch_size=2, max_wait_ms=50)
+        batcher.start()
+        try:
+            return await submit_all(batcher, [1, 2, 3, 4, 5])
+        finally:
+            await batcher.stop()
+
+    assert asyncio.run(run()) == [2, 4, 6, 8, 10]
+    assert [len(batch) for batch in batch_fn.batches] == [2, 2, 1]
+    assert [item for batch in batch_fn.batches for item in batch] == [1, 2, 3, 4, 5]
+
+
+def test_batch_fn_error_reaches_every_caller_in_the_batch():
+    def failing_batch_fn(items):
+        raise RuntimeError("model failed")
+
+    async def run():
+        batcher = DynamicBatcher(failing_batch_fn, max_batch_size=8, max_wait_ms=50)
+        batcher.start()
+        try:
+            return await asyncio.gather(
+                *(batcher.submit(item) for item in [1, 2, 3]), return_exceptions=True
+            )
+        finally:
+            await batcher.stop()
+
+    results = asyncio.run(run())
+    assert len(results) == 3
+    for result in results:
+        assert isinstance(result, RuntimeError)
+        assert str(result) == "model failed"
+
+
+def test_batcher_keeps_serving_after_a_failed_batch():
+    calls = []
+
+    def flaky_batch_fn(items):
+        calls.append(items)
+        if len(calls) == 1:
+            raise RuntimeError("first batch fails")
+        return items
+
+    async def run():
+        batcher = DynamicBatcher(flaky_batch_fn, max_batch_size=8, max_wait_ms=1)
+        batcher.start()
+        try:
+            with pytest.raises(RuntimeError):
+                await batcher.submit("a")
+            return await batcher.submit("b")
+        finally:
+            await batcher.stop()
+
+    assert asyncio.run(run()) == "b"
+
+
+def test_batcher_restarts_after_stop():
+    batch_fn = RecordingBatchFn()
+    batcher = DynamicBatcher(batch_fn, max_batch_size=8, max_wait_ms=1)
+
+    async def serve(item):
+        batcher.start()
+        try:
+            return await batcher.submit(item)
+        finally:
+            await batcher.stop()
+
+    # Each asyncio.run is a fresh event loop, like a restarted app lifespan
+    assert asyncio.run(serve(1)) == 2
+    first_executor = batcher.executor
+    assert asyncio.run(serve(2)) == 4
+    assert batcher.executor is not first_executor
@@ -0,0 +1,50 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from model_registry import pad_to_bucket, tokenize_to_bucket  # noqa: E402
+
+BUCKETS = (4, 8, 16)
+
+
+class WordTokenizer:
+    """One id per whitespace-separated word, with the HF call/pad interface."""
+
+    pad_token_id = 0
+
+    def __call__(self, texts, truncation=False, max_length=None):
+        input_ids = [[len(word) for word in text.split()] for text in texts]
+        if truncation:
+            input_ids = [ids[:max_length] for ids in input_ids]
+        return {"input_ids": input_ids}
+
+    def pad(self, encoded, padding, max_length, return_tensors):
+        input_ids, attention_mask = [], []
+        for ids in encoded["input_ids"]:
+            fill = max_length - len(ids)
+            input_ids.append(ids + [self.pad_token_id] * fill)
+            attention_mask.append([1] * len(ids) + [0] * fill)
+        return {
+            "input_ids": torch.tensor(input_ids),
+            "attention_mask": torch.tensor(attention_mask),
+        }
+
+
+@pytest.mark.parametrize(
+    "lengths, bucket",
+    [([1], 4), ([4], 4), ([5], 8), ([3, 9], 16), ([16], 16)],
+)
+def test_pad_to_bucket_picks_smallest_bucket_that_fits(lengths, bucket):
+    input_ids = [[1] * length for length in lengths]
+    inputs = pad_to_bucket(WordTokenizer(), input_ids, BUCKETS, device="cpu")
+
+    assert inputs["input_ids"].shape == (len(lengths), bucket)
+    assert inputs["attention_mask"].sum(dim=1).tolist() == lengths
+
+
+def test_tokenize_to_bucket_truncates_to_largest_bucket():
+    inputs = tokenize_to_bucket(WordTokenizer(), ["word " * 40], BUCKETS, device="cpu")
+
+    assert inputs["input_ids"].shape == (1, BUCKETS[-1])
+    assert inputs["attention_mask"].all()
@@ -0,0 +1,38 @@
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+pytest.importorskip("fastapi")
+
+from text_query_service import detect_domain, detect_image_intent  # noqa: E402
+
+
+@pytest.mark.parametrize(
+    "text, domain",
+    [
+        ("my tomato plant has spots", "plant"),
+        ("spots on banana plant leaves", "plant"),
+        ("my apple is rotting", "fruit"),
+        ("my cow is not eating", "livestock"),
+        ("tilapia in my pond", "fish"),
+        # Simple plurals match their singular keyword
+        ("my cows are not eating", "livestock"),
+        ("hens stopped laying", "livestock"),
+        ("tomato plants wilting", "plant"),
+        # Ties go to the earlier domain in DOMAIN_KEYWORDS
+        ("fish and cow", "livestock"),
+        ("mango tree", "plant"),
+    ],
+)
+def test_detect_domain(text, domain):
+    assert detect_domain(text) == domain
+
+
+@pytest.mark.parametrize("text", ["what is the weather today", "", "carpet cleaning"])
+def test_detect_domain_out_of_scope(text):
+    assert detect_domain(text) is None
+
+
+def test_detect_image_intent():
+    assert detect_image_intent("show me a photo of leaf blight")
+    assert not detect_image_intent("how do i treat leaf blight")
@@ -1,18 +1,26 @@
 import torch
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import Optional, Literal
+from typing import Dict, List, Optional, Literal, Tuple
 import re
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
+from batching import DynamicBatcher
+from model_registry import get_text_model, get_tokenizer, pad_to_bucket
 
 router = APIRouter()
 
 # -------------------------------------------------
 # Global variables
 # -------------------------------------------------
+MODEL_NAME = "google/flan-t5-small"
 tokenizer = None
 model = None
-DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+
+# Queries are padded to one of these lengths so input shapes stay static.
+# The prompt template alone is well past 128 tokens, hence the 512 bucket.
+INPUT_BUCKETS = (64, 128, 256, 512)
 
 OUT_OF_SCOPE_MSG = (
     "I can help only with plant, fruit, livestock, and fish related questions."
@@ -23,11 +31,21 @@ OUT_OF_SCOPE_MSG = (
 # -------------------------------------------------
 def load_text_model():
     global tokenizer, model
-    if model is None:
-        model_name = "google/flan-t5-small"
-        tokenizer = AutoTokenizer.from_pretrained(model_name)
-        model = AutoModelForSeq2SeqLM.from_pretrained(model_name).to(DEVICE)
-        model.eval()
+    tokenizer = get_tokenizer(MODEL_NAME)
+    model = get_text_model(MODEL_NAME)
+
+def warm_up_text_model(rounds: int = 3):
+    for _ in range(rounds):
+        generate_answers([("plant", "How do I prevent leaf spot on tomato plants?")])
+
+@asynccontextmanager
+async def lifespan(app):
+    # Entered from the app lifespan so the model is ready before traffic
+    load_text_model()
+    warm_up_text_model()
+    text_batcher.start()
+    yield
+    await text_batcher.stop()
 
 # -------------------------------------------------
 # Schemas
@@ -61,49 +79,22 @@ DOMAIN_KEYWORDS = {
     ]
 }
 
-# -------------------------------------------------
-# Helpers
-# -------------------------------------------------
-def detect_domain(text: str) -> Optional[str]:
-    for domain, words in DOMAIN_KEYWORDS.items():
-        for w in words:
-            if re.search(rf"\b{w}\b", text.lower()):
-                return domain
-    return None
+# Flat keyword -> domain map so each query word is a single dict lookup.
+# Two-word keywords ("banana plant") are matched against adjacent word pairs.
+KEYWORD_DOMAINS: Dict[str, str] = {}
+for _domain, _words in DOMAIN_KEYWORDS.items():
+    for _word in _words:
+        KEYWORD_DOMAINS.setdefault(_word, _domain)
 
-def detect_image_intent(text: str) -> bool:
-    return bool(re.search(r"(image|photo|picture|pic)", text.lower()))
+WORD_PATTERN = re.compile(r"\w+")
+IMAGE_INTENT_PATTERN = re.compile(r"(image|photo|picture|pic)")
 
 # -------------------------------------------------
-# Route
+# Prompt
 # -------------------------------------------------
-@router.post("/text/query", response_model=TextQueryResponse)
-async def text_query(request: TextQueryRequest):
-    load_text_model()
-
-    text = request.text.strip()
-    if not text:
-        raise HTTPException(status_code=400, detail="Empty query")
-
-    domain = detect_domain(text)
-    if not domain:
-        return TextQueryResponse(
-            type="text",
-            domain="plant",
-            answer=OUT_OF_SCOPE_MSG
-        )
-
-    # Image intent
-    if detect_image_intent(text):
-        return TextQueryResponse(
-            type="image",
-            domain=domain,
-            imageQuery=text,
-            answer=f"This image is related to {text} in the {domain} domain."
-        )
-
-    # ---------------- IMPROVED PROMPT ----------------
-    prompt = f"""
+# The question is appended as token ids, so the template's own ids are
+# encoded once per domain rather than on every request.
+PROMPT_TEMPLATE = """
 You are an agricultural and veterinary domain specialist.
 
 You have expertise in:
@@ -131,20 +122,104 @@ Recommended treatments or pesticides:
 General care tips:
 
 Question:
-{text}
 """
 
-    try:
-        inputs = tokenizer(prompt, return_tensors="pt").to(DEVICE)
+# -------------------------------------------------
+# Helpers
+# -------------------------------------------------
+# Both detectors expect text that is already lowercased
+def lookup_keyword(word: str) -> Optional[str]:
+    domain = KEYWORD_DOMAINS.get(word)
+    if domain is None and word.endswith("s"):
+        # Accept simple plurals ("cows", "tomato plants")
+        domain = KEYWORD_DOMAINS.get(word[:-1])
+    return domain
 
+def detect_domain(text: str) -> Optional[str]:
+    words = WORD_PATTERN.findall(text)
+    pairs = (" ".join(pair) for pair in zip(words, words[1:]))
+    matched = {lookup_keyword(w) for w in words}
+    matched.update(lookup_keyword(p) for p in pairs)
+    # Keep the DOMAIN_KEYWORDS order as the tie-break between domains
+    for domain in DOMAIN_KEYWORDS:
+        if domain in matched:
+            return domain
+    return None
+
+def detect_image_intent(text: str) -> bool:
+    return bool(IMAGE_INTENT_PATTERN.search(text))
+
+@lru_cache(maxsize=None)
+def prompt_prefix_ids(domain: str) -> Tuple[int, ...]:
+    prefix = PROMPT_TEMPLATE.format(domain=domain)
+    return tuple(tokenizer(prefix, add_special_tokens=False)["input_ids"])
+
+def build_prompt_ids(domain: str, question_ids: List[int]) -> List[int]:
+    prefix = prompt_prefix_ids(domain)
+    # Long questions are cut to whatever the largest bucket has left after
+    # the template and </s>, so the question itself is never dropped
+    budget = INPUT_BUCKETS[-1] - len(prefix) - 1
+    return [*prefix, *question_ids[:budget], tokenizer.eos_token_id]
+
+def generate_answers(queries: List[Tuple[str, str]]) -> List[str]:
+    question_ids = tokenizer(
+        [text for _, text in queries], add_special_tokens=False
+    )["input_ids"]
+    inputs = pad_to_bucket(
+        tokenizer,
+        [build_prompt_ids(domain, ids) for (domain, _), ids in zip(queries, question_ids)],
+        INPUT_BUCKETS,
+    )
+
+    with torch.inference_mode():
         outputs = model.generate(
             **inputs,
-            max_length=300,
-            num_beams=5,
-            no_repeat_ngram_size=2
+            max_new_tokens=200,
+            num_beams=2,
+            early_stopping=True,
+            no_repeat_ngram_size=2,
+            return_dict_in_generate=False
+        )
+
+    return [
+        answer.strip()
+        # One device-to-host transfer, then decode plain Python ints
+        for answer in tokenizer.batch_decode(outputs.tolist(), skip_special_tokens=True)
+    ]
+
+# Concurrent queries are answered by a single batched generate call
+text_batcher = DynamicBatcher(generate_answers, max_batch_size=8, max_wait_ms=10)
+
+# -------------------------------------------------
+# Route
+# -------------------------------------------------
+@router.post("/text/query", response_model=TextQueryResponse)
+async def text_query(request: TextQueryRequest):
+    text = request.text.strip()
+    if not text:
+        raise HTTPException(status_code=400, detail="Empty query")
+
+    text_lower = text.lower()
+
+    domain = detect_domain(text_lower)
+    if not domain:
+        return TextQueryResponse(
+            type="text",
+            domain="plant",
+            answer=OUT_OF_SCOPE_MSG
         )
 
-        answer = tokenizer.decode(outputs[0], skip_special_tokens=True).strip()
+    # Image intent
+    if detect_image_intent(text_lower):
+        return TextQueryResponse(
+            type="image",
+            domain=domain,
+            imageQuery=text,
+            answer=f"This image is related to {text} in the {domain} domain."
+        )
+
+    try:
+        answer = await text_batcher.submit((domain, text))
 
         if len(answer) < 20:
             answer = (